@@ -1,10 +1,26 @@
+import asyncio
+import numbers
+import re
+import sys
+import time
+
 import serial
 
+_AXIS_RE = re.compile(r'([A-Z])=(\S+)') # i.e. 'X=1.500000' in a reply
+
+def _is_number(v): # i.e. int, float, numpy scalars (not bool)
+    return isinstance(v, numbers.Real) and not isinstance(v, bool)
+
 class Controller:
     '''
     Basic device adaptor for ASI MS-2000-500-CP multi-axis stage controller.
     See 'ASI_controller_labels.pdf' for explanation of model name. Many more
     commands are available and have not been implemented.
+
+    Settings are only read back from the controller (to check they were
+    applied) when 'very_verbose=True'. Otherwise the last value written is
+    kept as the attribute, which saves one serial round trip per setting but
+    will not notice a controller that silently rejected a command.
     '''
     def __init__(self,
                  which_port,                # COM port for controller
@@ -14,30 +30,61 @@ class Controller:
                  axes_max_mm=None,          # max range (tuple)
                  encoder_counts_per_um=None,# optional -> expert only (tuple)
                  use_pwm=False,             # optional pwm output for LED
+                 baudrate=115200,           # must match DIP switches 4, 5
                  name='MS-2000-500-CP',     # optional name
                  verbose=True,              # False for max speed
                  very_verbose=False):       # True for debug
         self.name = name
         self.verbose = verbose
         self.very_verbose = very_verbose
-        if self.verbose: print('%s: Opening...'%name, end='')
+        self.verify_writes = very_verbose
+        # the controller baudrate is set by DIP Switches 4 and 5 (not by
+        # software): for baudrate=115200 DIP Switches 4 and 5 must be 'DOWN'
+        # (default is DIP Switches 4 and 5 'UP' and baudrate=9600)
+        assert baudrate in (9600, 19200, 28800, 115200), (
+            '%s: baudrate %s not supported'%(name, baudrate))
         try:
             self.port = serial.Serial(
-                # for baudrate=115200 DIP Switches 4 and 5 must be 'DOWN'
-                # (default is DIP Switches 4 and 5 'UP' and baudrate=9600)
-                port=which_port, baudrate=115200, timeout=5)
+                port=which_port, baudrate=baudrate, timeout=5)
         except serial.serialutil.SerialException:
             raise IOError('%s: No connection on port %s'%(name, which_port))
-        if self.verbose: print(" done.")
-        self.version = self._send('V').strip(':A \r\n')
-        assert self.version == 'Version: USB-9.2k', (
-            '%s: controller version not supported'%name)
-        self._set_ttl_in_mode('disabled')
-        self._set_ttl_out_mode('low')
+        self._set_low_latency()
+        if self.verbose: print('%s: Opening... done.'%name)
+        self.port.write(b'V\r') # no '_send' -> explicit checks, even with -O
+        try:
+            self.version = self._read_line()
+        except UnicodeDecodeError: # garbage -> wrong baudrate?
+            self.version = ''
+        if self.version != 'Version: USB-9.2k':
+            self.port.close()
+            if self.version == '':
+                raise IOError('%s: No response at baudrate %s (check DIP '
+                              'Switches 4 and 5)'%(name, baudrate))
+            raise IOError('%s: controller version %r not supported'%(
+                name, self.version))
+        self._set_ttl('disabled', 'low')
         self.state = None
         if axes is not None:
             assert axes == ('X','Y') or axes == ('Z',) or axes == ('X','Y','Z')
             self.axes = axes
+            # command templates, i.e. 'S VX=%0.6f VY=%0.6f':
+            self._velocity_fmt = 'S ' + ' '.join('V%s=%%0.6f'%a for a in axes)
+            self._acceleration_fmt = 'AC ' + ' '.join(
+                'AC%s=%%0.6f'%a for a in axes)
+            self._settle_time_fmt = 'WT ' + ' '.join(
+                'WT%s=%%0.6f'%a for a in axes)
+            self._precision_fmt = 'PC ' + ' '.join(
+                'PC%s=%%0.6f'%a for a in axes)
+            self._move_fmt = 'M ' + ' '.join('%s=%%0.6f'%a for a in axes)
+            self._load_fmt = 'LD ' + ' '.join('%s=%%0.6f'%a for a in axes)
+            # queries, i.e. 'S X? Y?' and 'W X Y':
+            axes_query = ' '.join(a + '?' for a in axes)
+            self._velocity_query = 'S ' + axes_query
+            self._acceleration_query = 'AC ' + axes_query
+            self._settle_time_query = 'WT ' + axes_query
+            self._precision_query = 'PC ' + axes_query
+            self._position_query = 'W ' + ' '.join(axes)
+            self._status_byte_query = 'RS ' + ' '.join(axes)
             assert lead_screws is not None, 'please choose lead screw options'
             assert len(lead_screws) == len(axes)
             screw2value = { # pitch (mm), res (nm), speed (mm/s)
@@ -46,26 +93,22 @@ class Controller:
                 'S' :(6.350, 22.0, 7.00),   # 'standard'
                 'F' :(1.590, 5.50, 1.75),   # 'fine'
                 'XF':(0.653, 2.20, 0.70)}   # 'extra-fine'
-            pitch_mm, resolution_nm, max_velocity_mmps = [], [], []
-            for a in range(len(axes)):
-                pitch_mm.append(screw2value[lead_screws[a]][0])
-                resolution_nm.append(screw2value[lead_screws[a]][1])
-                max_velocity_mmps.append(screw2value[lead_screws[a]][2])
-            self.pitch_mm = tuple(pitch_mm)
-            self.resolution_nm = tuple(resolution_nm)
-            self.max_velocity_mmps = tuple(max_velocity_mmps)
+            self.pitch_mm, self.resolution_nm, self.max_velocity_mmps = zip(
+                *(screw2value[s] for s in lead_screws))
             assert axes_min_mm is not None, 'please specify min range of axes'
             assert axes_max_mm is not None, 'please specify max range of axes'
             assert len(axes_min_mm) == len(axes)
             assert len(axes_max_mm) == len(axes)
-            for v in axes_min_mm: assert type(v) is int or type(v) is float
-            for v in axes_max_mm: assert type(v) is int or type(v) is float
+            assert all(_is_number(v) for v in axes_min_mm)
+            assert all(_is_number(v) for v in axes_max_mm)
             self.min_position_um = tuple(1e3 * v for v in axes_min_mm)
             self.max_position_um = tuple(1e3 * v for v in axes_max_mm)
             self.encoder_counts_per_um = len(axes)*(10,)# default value
             if encoder_counts_per_um is not None:
                 assert len(encoder_counts_per_um) == len(axes)
-                for v in encoder_counts_per_um: assert type(v) is int
+                assert all(isinstance(v, numbers.Integral) and
+                           not isinstance(v, bool)
+                           for v in encoder_counts_per_um)
                 self.encoder_counts_per_um = encoder_counts_per_um
             self.min_acceleration_ms = len(axes)*(25,)  # min acc/dec ramp
             self.max_acceleration_ms = len(axes)*(1e3,) # max acc/dec ramp
@@ -73,43 +116,86 @@ class Controller:
             self.tol_settle_time_ms = len(axes)*(1,)    # tolerance
             self.min_precision_um = len(axes)*(1,)      # high precision limit
             self.max_precision_um = len(axes)*(1e6,)    # low precision limit
-            self._set_velocity(tuple(0.67 * v for v in self.max_velocity_mmps))
-            self._set_acceleration(self.min_acceleration_ms)
-            self._set_settle_time(len(axes)*(0,))
-            self._set_precision(self.min_precision_um)
+            self.reconfigure(
+                velocity_mmps=tuple(0.67 * v for v in self.max_velocity_mmps),
+                acceleration_ms=self.min_acceleration_ms,
+                settle_time_ms=len(axes)*(0,),
+                precision_um=self.min_precision_um,
+                verify=self.verify_writes)
             self._get_position()
             self._get_motor_moving()
             self._set_joystick_enable(True)
             self._get_status_byte()
             self._moving = False
+            self._poll_interval_s = 0.002     # 1st pause between '/' polls
+            self._max_poll_interval_s = 0.05  # pause grows x1.5 up to this
+            self._sequence = False            # True -> ring buffer move
+            self._ring_buffer_size = 50       # max positions (firmware)
+            self._max_idle_s = 1              # + settle time -> seq. stalled
         if use_pwm:
             self.set_pwm_state('off')
             self.set_pwm_intensity(1)
         return None
 
+    def _set_low_latency(self):
+        # Linux only: stop the usb-serial driver holding back short replies
+        # (Windows: the Silicon Labs CP210x driver has no latency timer)
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            self.port.set_low_latency_mode(True)
+        except (ValueError, AttributeError, OSError): # not supported -> skip
+            pass
+        return None
+
     def _send(self, cmd, respond=True, parse_axes=False):
         if self.very_verbose:
             print("%s: sending cmd = "%self.name, cmd)
-        assert type(cmd) is str, 'command should be a string'
-        cmd = bytes(cmd, encoding='ascii')
-        self.port.write(cmd + b'\r')
-        response = self.port.readline().decode('ascii').strip(':A \r\n')
+        assert isinstance(cmd, str), 'command should be a string'
+        self.port.write(bytes(cmd, encoding='ascii') + b'\r')
+        response = self._read_response(respond, parse_axes)
+        if self.very_verbose: # debug only: extra syscall
+            print("%s: -> response = "%self.name, response)
+            assert self.port.in_waiting == 0
+        return response
+
+    def _send_many(self, cmds, respond=False, parse_axes=False):
+        # one write for several commands, then one response line per command
+        if self.very_verbose:
+            print("%s: sending cmds = "%self.name, cmds)
+        assert all(isinstance(cmd, str) for cmd in cmds), (
+            'commands should be strings')
+        self.port.write(
+            b'\r'.join(bytes(cmd, encoding='ascii') for cmd in cmds) + b'\r')
+        responses = tuple(
+            self._read_response(respond, parse_axes) for cmd in cmds)
+        if self.very_verbose: # debug only: extra syscall
+            print("%s: -> responses = "%self.name, responses)
+            assert self.port.in_waiting == 0
+        return responses
+
+    def _read_line(self):
+        # replies are terminated by '\r\n' and (usually) prefixed by ':A'. Only
+        # remove the ':A' itself since values can contain 'A' and spaces:
+        response = self.port.read_until(b'\r\n').decode('ascii')
+        response = response.rstrip('\r\n').removeprefix(':A')
+        return response.removesuffix(':A').strip(' ') # 'X=val :A'
+
+    def _read_response(self, respond, parse_axes):
+        response = self._read_line()
         if respond:
             assert response != '', '%s: No response'%self.name
             if parse_axes:
-                axes, values = [], []
-                for a in response.split():
-                    axis, value = a.split('=')
-                    axes.append(axis), values.append(float(value))
-                assert tuple(axes) == self.axes
-                response = tuple(values)
+                response = self._parse_axes(response)
         else:
             response = None
-        if self.very_verbose:
-            print("%s: -> response = "%self.name, response)
-        assert self.port.in_waiting == 0
         return response
 
+    def _parse_axes(self, response):
+        pairs = _AXIS_RE.findall(response)
+        assert tuple(p[0] for p in pairs) == self.axes
+        return tuple(float(p[1]) for p in pairs)
+
     def _get_ttl_in_mode(self):
         if self.verbose:
             print("%s: getting ttl in mode"%self.name)
@@ -120,18 +206,6 @@ class Controller:
             print("%s: -> ttl in mode = %s"%(self.name, self._ttl_in_mode))
         return self._ttl_in_mode
 
-    def _set_ttl_in_mode(self, mode):
-        if self.verbose:
-            print("%s: setting ttl in mode = %s"%(self.name, mode))
-        mode2code = {'disabled':'0', 'toggle_ttl_out':'10'}
-        assert mode in mode2code, "mode '%s' not allowed"%mode
-        self._ttl_in_mode = self._send(
-            'TTL X=%s'%mode2code[mode], respond=False)
-        assert self._get_ttl_in_mode() == mode
-        if self.verbose:
-            print("%s: -> done setting ttl in mode."%self.name)
-        return None
-
     def _get_ttl_out_mode(self):
         if self.verbose:
             print("%s: getting ttl out mode"%self.name)
@@ -142,42 +216,62 @@ class Controller:
             print("%s: -> ttl out mode = %s"%(self.name, self._ttl_out_mode))
         return self._ttl_out_mode
 
-    def _set_ttl_out_mode(self, mode):
-        if self.verbose:
-            print("%s: setting ttl out mode = %s"%(self.name, mode))
-        mode2code = {'low':'0', 'high':'1', 'pwm':'9'}
-        assert mode in mode2code, "mode '%s' not allowed"%mode
-        self._ttl_out_mode = self._send(
-            'TTL Y=%s'%mode2code[mode], respond=False)
-        assert self._get_ttl_out_mode() == mode
-        if self.verbose:
-            print("%s: -> done setting ttl out mode."%self.name)
+    def _set_ttl(self, in_mode=None, out_mode=None): # 'None' -> no change
+        if self.verbose:
+            print("%s: setting ttl in mode = %s, ttl out mode = %s"%(
+                self.name, in_mode, out_mode))
+        assert in_mode is not None or out_mode is not None, 'no ttl mode given'
+        in_mode2code = {'disabled':'0', 'toggle_ttl_out':'10'}
+        out_mode2code = {'low':'0', 'high':'1', 'pwm':'9'}
+        cmd_string = ['TTL']
+        if in_mode is not None:
+            assert in_mode in in_mode2code, "mode '%s' not allowed"%in_mode
+            cmd_string.append('X=%s'%in_mode2code[in_mode])
+        if out_mode is not None:
+            assert out_mode in out_mode2code, "mode '%s' not allowed"%out_mode
+            cmd_string.append('Y=%s'%out_mode2code[out_mode])
+        self._send(' '.join(cmd_string), respond=False)
+        if in_mode is not None:
+            self._ttl_in_mode = in_mode
+            if self.verify_writes:
+                assert self._get_ttl_in_mode() == in_mode
+        if out_mode is not None:
+            self._ttl_out_mode = out_mode
+            if self.verify_writes:
+                assert self._get_ttl_out_mode() == out_mode
+        if self.verbose:
+            print("%s: -> done setting ttl."%self.name)
         return None
 
     def _get_velocity(self):
         if self.verbose:
             print("%s: getting velocity"%self.name)
         self.velocity_mmps = self._send(
-            'S '+'? '.join(self.axes)+'?', parse_axes=True)
+            self._velocity_query, parse_axes=True)
         if self.verbose:
             print("%s: -> velocity (mm/s) = %s"%(self.name, self.velocity_mmps))
         return self.velocity_mmps
 
-    def _set_velocity(self, velocity_mmps): # tuple i.e. (2, 5, None)
-        if self.verbose:
-            print("%s: setting velocity = %s"%(self.name, velocity_mmps))
+    def _velocity_cmd(self, velocity_mmps): # tuple i.e. (2, 5, None)
         assert len(velocity_mmps) == len(self.axes)
-        for v in velocity_mmps: assert type(v) is int or type(v) is float
-        cmd_string = ['S ']
+        assert all(v is None or _is_number(v) for v in velocity_mmps)
         velocity_mmps = list(velocity_mmps)
         for i, v in enumerate(velocity_mmps):
             if v is None:
                 velocity_mmps[i] = self.velocity_mmps[i]
             assert 0 <= velocity_mmps[i] <= self.max_velocity_mmps[i]
-            velocity_mmps[i] = round(velocity_mmps[i], 6)
-            cmd_string.append('V%s=%0.6f '%(self.axes[i], velocity_mmps[i]))
-        self._send(''.join(cmd_string), respond=False)
-        assert self._get_velocity() == tuple(velocity_mmps)
+            velocity_mmps[i] = round(float(velocity_mmps[i]), 6)
+        velocity_mmps = tuple(velocity_mmps)
+        return self._velocity_fmt%velocity_mmps, velocity_mmps
+
+    def _set_velocity(self, velocity_mmps): # tuple i.e. (2, 5, None)
+        if self.verbose:
+            print("%s: setting velocity = %s"%(self.name, velocity_mmps))
+        cmd, velocity_mmps = self._velocity_cmd(velocity_mmps)
+        self._send(cmd, respond=False)
+        self.velocity_mmps = velocity_mmps
+        if self.verify_writes:
+            assert self._get_velocity() == velocity_mmps
         if self.verbose:
             print("%s: -> done setting velocity."%self.name)
         return None
@@ -186,28 +280,33 @@ class Controller:
         if self.verbose:
             print("%s: getting acceleration"%self.name)
         self.acceleration_ms = self._send(
-            'AC '+'? '.join(self.axes)+'?', parse_axes=True)
+            self._acceleration_query, parse_axes=True)
         if self.verbose:
             print("%s: -> acceleration (ms) = %s"%(
                 self.name, self.acceleration_ms))
         return self.acceleration_ms
 
-    def _set_acceleration(self, acceleration_ms): # tuple i.e. (2, 5, None)
-        if self.verbose:
-            print("%s: setting acceleration = %s"%(self.name, acceleration_ms))
+    def _acceleration_cmd(self, acceleration_ms): # tuple i.e. (2, 5, None)
         assert len(acceleration_ms) == len(self.axes)
-        for v in acceleration_ms: assert type(v) is int or type(v) is float
-        cmd_string = ['AC ']
+        assert all(v is None or _is_number(v) for v in acceleration_ms)
         acceleration_ms = list(acceleration_ms)
         for i, a in enumerate(acceleration_ms):
             if a is None:
                 acceleration_ms[i] = self.acceleration_ms[i]
-            acceleration_ms[i] = round(acceleration_ms[i])
+            acceleration_ms[i] = round(float(acceleration_ms[i]))
             assert acceleration_ms[i] >= self.min_acceleration_ms[i]
             assert acceleration_ms[i] <= self.max_acceleration_ms[i]
-            cmd_string.append('AC%s=%0.6f '%(self.axes[i], acceleration_ms[i]))
-        self._send(''.join(cmd_string), respond=False)
-        assert self._get_acceleration() == tuple(acceleration_ms)
+        acceleration_ms = tuple(acceleration_ms)
+        return self._acceleration_fmt%acceleration_ms, acceleration_ms
+
+    def _set_acceleration(self, acceleration_ms): # tuple i.e. (2, 5, None)
+        if self.verbose:
+            print("%s: setting acceleration = %s"%(self.name, acceleration_ms))
+        cmd, acceleration_ms = self._acceleration_cmd(acceleration_ms)
+        self._send(cmd, respond=False)
+        self.acceleration_ms = acceleration_ms
+        if self.verify_writes:
+            assert self._get_acceleration() == acceleration_ms
         if self.verbose:
             print("%s: -> done setting acceleration."%self.name)
         return None
@@ -216,30 +315,38 @@ class Controller:
         if self.verbose:
             print("%s: getting settle time"%self.name)
         self.settle_time_ms = self._send(
-            'WT '+'? '.join(self.axes)+'?', parse_axes=True)
+            self._settle_time_query, parse_axes=True)
         if self.verbose:
             print("%s: -> settle time (ms) = %s"%(
                 self.name, self.settle_time_ms))
         return self.settle_time_ms
 
-    def _set_settle_time(self, settle_time_ms): # tuple i.e. (2, 5, None)
-        if self.verbose:
-            print("%s: setting settle time = %s"%(self.name, settle_time_ms))
+    def _settle_time_cmd(self, settle_time_ms): # tuple i.e. (2, 5, None)
         assert len(settle_time_ms) == len(self.axes)
-        for v in settle_time_ms: assert type(v) is int or type(v) is float
-        cmd_string = ['WT ']
+        assert all(v is None or _is_number(v) for v in settle_time_ms)
         settle_time_ms = list(settle_time_ms)
         for i, t in enumerate(settle_time_ms):
             if t is None:
                 settle_time_ms[i] = self.settle_time_ms[i]
-            settle_time_ms[i] = round(settle_time_ms[i])
+            settle_time_ms[i] = round(float(settle_time_ms[i]))
             assert 0 <= settle_time_ms[i] <= self.max_settle_time_ms[i]
-            cmd_string.append('WT%s=%0.6f '%(self.axes[i], settle_time_ms[i]))
-        self._send(''.join(cmd_string), respond=False)
-        self._get_settle_time()
-        for i, (ti, tf) in enumerate(zip(settle_time_ms, self.settle_time_ms)):
+        settle_time_ms = tuple(settle_time_ms)
+        return self._settle_time_fmt%settle_time_ms, settle_time_ms
+
+    def _check_settle_time(self, target_ms, actual_ms):
+        for i, (ti, tf) in enumerate(zip(target_ms, actual_ms)):
             assert tf >= ti - self.tol_settle_time_ms[i]
             assert tf <= ti + self.tol_settle_time_ms[i]
+        return None
+
+    def _set_settle_time(self, settle_time_ms): # tuple i.e. (2, 5, None)
+        if self.verbose:
+            print("%s: setting settle time = %s"%(self.name, settle_time_ms))
+        cmd, settle_time_ms = self._settle_time_cmd(settle_time_ms)
+        self._send(cmd, respond=False)
+        self.settle_time_ms = settle_time_ms
+        if self.verify_writes:
+            self._check_settle_time(settle_time_ms, self._get_settle_time())
         if self.verbose:
             print("%s: -> done setting settle_time."%self.name)
         return None
@@ -248,50 +355,105 @@ class Controller:
         if self.verbose:
             print("%s: getting precision"%self.name)
         precision_mm = self._send(
-            'PC '+'? '.join(self.axes)+'?', parse_axes=True)
+            self._precision_query, parse_axes=True)
         self.precision_um = tuple(round(1e6 * p) for p in precision_mm)
         if self.verbose:
             print("%s: -> precision (um) = %s"%(
                 self.name, self.precision_um))
         return self.precision_um
 
-    def _set_precision(self, precision_um): # tuple i.e. (2, 5, None)
-        if self.verbose:
-            print("%s: setting precision = %s"%(self.name, precision_um))
+    def _precision_cmd(self, precision_um): # tuple i.e. (2, 5, None)
         assert len(precision_um) == len(self.axes)
-        for v in precision_um: assert type(v) is int or type(v) is float
-        cmd_string = ['PC ']
+        assert all(v is None or _is_number(v) for v in precision_um)
         precision_um = list(precision_um)
         for i, p in enumerate(precision_um):
             if p is None:
                 precision_um[i] = self.precision_um[i]
-            precision_um[i] = round(precision_um[i])
+            precision_um[i] = round(float(precision_um[i]))
             assert precision_um[i] >= self.min_precision_um[i]
             assert precision_um[i] <= self.max_precision_um[i]
-            cmd_string.append(
-                'PC%s=%0.6f '%(self.axes[i], 1e-6 * precision_um[i]))
-        self._send(''.join(cmd_string), respond=False)
-        assert self._get_precision() == tuple(precision_um)
+        precision_um = tuple(precision_um)
+        precision_mm = tuple(1e-6 * p for p in precision_um)
+        return self._precision_fmt%precision_mm, precision_um
+
+    def _set_precision(self, precision_um): # tuple i.e. (2, 5, None)
+        if self.verbose:
+            print("%s: setting precision = %s"%(self.name, precision_um))
+        cmd, precision_um = self._precision_cmd(precision_um)
+        self._send(cmd, respond=False)
+        self.precision_um = precision_um
+        if self.verify_writes:
+            assert self._get_precision() == precision_um
         if self.verbose:
             print("%s: -> done setting precision."%self.name)
         return None
 
+    def reconfigure(self,
+                    velocity_mmps=None,     # tuple i.e. (2, 5, None)
+                    acceleration_ms=None,   # tuple i.e. (25, 50, None)
+                    settle_time_ms=None,    # tuple i.e. (0, 10, None)
+                    precision_um=None,      # tuple i.e. (1, 2, None)
+                    verify=False):          # True -> read back (1 extra write)
+        # set any combination of motion parameters with a single write
+        if self.verbose:
+            print("%s: reconfiguring"%self.name)
+        cmds = []
+        if velocity_mmps is not None:
+            cmd, velocity_mmps = self._velocity_cmd(velocity_mmps)
+            cmds.append(cmd)
+        if acceleration_ms is not None:
+            cmd, acceleration_ms = self._acceleration_cmd(acceleration_ms)
+            cmds.append(cmd)
+        if settle_time_ms is not None:
+            cmd, settle_time_ms = self._settle_time_cmd(settle_time_ms)
+            cmds.append(cmd)
+        if precision_um is not None:
+            cmd, precision_um = self._precision_cmd(precision_um)
+            cmds.append(cmd)
+        if len(cmds) > 0:
+            self._send_many(cmds, respond=False)
+        if verify: # all 4 queries in 1 write, attributes <- values read back
+            queries = (self._velocity_query, self._acceleration_query,
+                       self._settle_time_query, self._precision_query)
+            velocity, acceleration, settle_time, precision_mm = self._send_many(
+                queries, respond=True, parse_axes=True)
+            precision = tuple(round(1e6 * p) for p in precision_mm)
+            if velocity_mmps is not None:
+                assert velocity == velocity_mmps
+            if acceleration_ms is not None:
+                assert acceleration == acceleration_ms
+            if settle_time_ms is not None:
+                self._check_settle_time(settle_time_ms, settle_time)
+            if precision_um is not None:
+                assert precision == precision_um
+            velocity_mmps, acceleration_ms = velocity, acceleration
+            settle_time_ms, precision_um = settle_time, precision
+        if velocity_mmps is not None: self.velocity_mmps = velocity_mmps
+        if acceleration_ms is not None: self.acceleration_ms = acceleration_ms
+        if settle_time_ms is not None: self.settle_time_ms = settle_time_ms
+        if precision_um is not None: self.precision_um = precision_um
+        if self.verbose:
+            print("%s: -> velocity (mm/s) = %s"%(self.name, self.velocity_mmps))
+            print("%s: -> acceleration (ms) = %s"%(
+                self.name, self.acceleration_ms))
+            print("%s: -> settle time (ms) = %s"%(
+                self.name, self.settle_time_ms))
+            print("%s: -> precision (um) = %s"%(self.name, self.precision_um))
+            print("%s: -> done reconfiguring."%self.name)
+        return None
+
     def _counts2position(self, counts):
-        position_um = []
-        for count, factor in zip(counts, self.encoder_counts_per_um):
-            position_um.append(float(count) / factor)
-        return tuple(position_um)
+        return tuple(float(c) / f
+                     for c, f in zip(counts, self.encoder_counts_per_um))
 
     def _position2counts(self, position_um):
-        counts = []
-        for position, factor in zip(position_um, self.encoder_counts_per_um):
-            counts.append(round(position * factor))
-        return tuple(counts)
+        return tuple(round(p * f)
+                     for p, f in zip(position_um, self.encoder_counts_per_um))
 
     def _get_position(self):
         if self.verbose:
             print("%s: getting position"%self.name)
-        response = self._send('W '+' '.join(self.axes)).strip(':A \r\n').split()
+        response = self._send(self._position_query).split()
         self.position_um = self._counts2position(response)
         if self.verbose:
             print("%s: -> position (um) = %s"%(self.name, self.position_um))
@@ -327,7 +489,7 @@ class Controller:
     def _get_status_byte(self):
         if self.verbose:
             print("%s: getting status byte"%self.name)
-        status_byte = self._send('RS '+' '.join(self.axes)) 
+        status_byte = self._send(self._status_byte_query) 
         if self.verbose:
             print("%s: -> status byte = %s"%(self.name, status_byte))
         return status_byte
@@ -335,15 +497,49 @@ class Controller:
     def _finish_moving(self):
         if not self._moving:
             return None
-        while True:
-            status = self._send('/')
-            if status == 'N':
-                break
+        delay_s = self._poll_interval_s
+        while not self._move_done():
+            time.sleep(delay_s)
+            delay_s = min(1.5 * delay_s, self._max_poll_interval_s)
+        self._end_move()
+        return None
+
+    def _at_position(self, position_um, target_um):
+        return all(abs(p - t) <= r for p, t, r in zip(
+            position_um, target_um, self.precision_um))
+
+    def _move_done(self):
+        idle = self._send('/') == 'N'
+        if not self._sequence:
+            return idle
+        # ring buffer: '/' can read 'N' between points, so count the points
+        # as they are reached (in order) and wait for all of them:
+        position_um = self._counts2position(
+            self._send(self._position_query).split())
+        targets_um = self._sequence_targets_um
+        while (self._sequence_index < len(targets_um) and self._at_position(
+            position_um, targets_um[self._sequence_index])):
+            self._sequence_index += 1
+        if self._sequence_index == len(targets_um) and idle:
+            return True
+        now_s = time.perf_counter()
+        if not idle or position_um != self._idle_position_um:
+            self._idle_position_um, self._idle_since_s = position_um, now_s
+        max_idle_s = self._max_idle_s + 1e-3 * max(self.settle_time_ms)
+        if now_s - self._idle_since_s > max_idle_s:
+            raise IOError('%s: ring buffer sequence stopped at %s (um) '
+                          'after %i of %i points (or a point was missed)'%(
+                              self.name, position_um, self._sequence_index,
+                              len(targets_um)))
+        return False
+
+    def _end_move(self):
         self._get_position()
         for i, p in enumerate(self.position_um):
             assert p >= self._target_move_um[i] - self.precision_um[i]
             assert p <= self._target_move_um[i] + self.precision_um[i]
         self._moving = False
+        self._sequence = False
         if self.joystick_enabled:  # re-enable
             for axis in self.axes:
                 self._send('J ' + axis + '+', respond=False)
@@ -352,33 +548,94 @@ class Controller:
 
     def move_um(self, move_um, relative=True, block=True):
         self._finish_moving()
+        self._start_move(move_um, relative)
+        if block:
+            self._finish_moving()
+        return None
+
+    def _target_um(self, move_um, relative, position_um): # absolute target
         assert len(move_um) == len(self.axes)
-        for v in move_um: assert type(v) is int or type(v) is float or v is None
+        assert all(v is None or _is_number(v) for v in move_um)
         move_um = list(move_um)
         for i, m in enumerate(move_um):
             if m is None:
-                move_um[i] = self.position_um[i]
+                move_um[i] = position_um[i]
             if m is not None and relative:
-                move_um[i] = self.position_um[i] + move_um[i]
+                move_um[i] = position_um[i] + move_um[i]
             assert move_um[i] >= self.min_position_um[i]
             assert move_um[i] <= self.max_position_um[i]
-        move_um = tuple(round(v, 3) for v in move_um) # round to nm
+        return tuple(round(float(v), 3) for v in move_um) # round to nm
+
+    def _start_move(self, move_um, relative):
+        move_um = self._target_um(move_um, relative, self.position_um)
         if self.verbose:
             print("%s: moving to (um) = %s"%(self.name, move_um))
-        cmd_string = ['M ']
-        for i in range(len(self.axes)):
-            cmd_string.append('%s=%0.6f '%(self.axes[i],
-                                           self._position2counts(move_um)[i]))
+        cmd = self._move_fmt%self._position2counts(move_um) # 1 conversion
         if self.joystick_enabled:  # disable
             for axis in self.axes:
                 self._send('J ' + axis + '-', respond=False)
-        self._send(''.join(cmd_string), respond=False)
+        self._send(cmd, respond=False)
         self._moving = True
         self._target_move_um = move_um
+        return None
+
+    def move_sequence(self, moves_um, relative=True, block=True):
+        # EXPERIMENTAL (not yet tested on a controller): load all moves into
+        # the controller 'ring buffer' and run them with a single trigger
+        # (needs the ring buffer module in the firmware). Each move is
+        # relative to the previous one if 'relative=True'.
+        self._finish_moving()
+        targets_um, position_um = [], self.position_um
+        for move_um in moves_um:
+            position_um = self._target_um(move_um, relative, position_um)
+            targets_um.append(position_um)
+        assert 0 < len(targets_um) <= self._ring_buffer_size, (
+            'please provide 1 to %i moves'%self._ring_buffer_size)
+        for t in targets_um[:-1]: # otherwise can't tell when the sequence ends
+            assert not self._at_position(t, targets_um[-1]), (
+                'earlier point %s is within precision of last point'%(t,))
+        if self.verbose:
+            print("%s: moving through (um) = %s"%(self.name, targets_um))
+        axis_byte = sum({'X':1, 'Y':2, 'Z':4}[a] for a in self.axes)
+        self._send('RM X=0', respond=False)             # clear ring buffer
+        self._send('RM Y=%d'%axis_byte, respond=False)  # axes to move
+        self._send('RM F=1', respond=False) # 'one shot' -> all on 1 trigger
+        for t in targets_um:
+            self._send(self._load_fmt%self._position2counts(t), respond=False)
+        if self.joystick_enabled:  # disable
+            for axis in self.axes:
+                self._send('J ' + axis + '-', respond=False)
+        self._send('RM', respond=False)                 # trigger
+        self._moving = True
+        self._sequence = True
+        self._sequence_targets_um, self._sequence_index = targets_um, 0
+        self._idle_position_um, self._idle_since_s = None, None
+        self._target_move_um = targets_um[-1]
         if block:
             self._finish_moving()
         return None
 
+    async def _finish_moving_async(self):
+        if not self._moving:
+            return None
+        # pyserial blocks -> run in a worker thread to free the event loop
+        loop = asyncio.get_running_loop()
+        delay_s = self._poll_interval_s
+        while not (await loop.run_in_executor(None, self._move_done)):
+            await asyncio.sleep(delay_s)
+            delay_s = min(1.5 * delay_s, self._max_poll_interval_s)
+        await loop.run_in_executor(None, self._end_move)
+        return None
+
+    async def move_um_async(self, move_um, relative=True):
+        # same as 'move_um(block=True)' but other tasks can run during the
+        # move. Don't call other methods on this controller until it returns.
+        await self._finish_moving_async()
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._start_move, move_um, relative)
+        await self._finish_moving_async()
+        return None
+
     def get_pwm_intensity(self):
         if self.verbose:
             print("%s: getting pwm intensity"%self.name)
@@ -392,11 +649,13 @@ class Controller:
     def set_pwm_intensity(self, intensity):
         if self.verbose:
             print("%s: setting pwm intensity = %s"%(self.name, intensity))
-        assert type(intensity) is int or type(intensity) is float
+        assert _is_number(intensity)
         intensity = int(intensity)
         assert 1 <= intensity <= 99
         self._send('LED X=%d'%intensity, respond=False)
-        assert self.get_pwm_intensity() == intensity
+        self.pwm_intensity = intensity
+        if self.verify_writes:
+            assert self.get_pwm_intensity() == intensity
         if self.verbose:
             print("%s: -> done setting pwm intensity."%self.name)
         return None
@@ -406,17 +665,13 @@ class Controller:
             print("%s: setting pwm state = %s"%(self.name, state))
         assert state in ('off', 'on', 'pwm', 'external')
         if state == 'off':
-            self._set_ttl_in_mode('disabled')
-            self._set_ttl_out_mode('low')
+            self._set_ttl('disabled', 'low')
         if state == 'on':
-            self._set_ttl_in_mode('disabled')
-            self._set_ttl_out_mode('high')
+            self._set_ttl('disabled', 'high')
         if state == 'pwm':
-            self._set_ttl_in_mode('disabled')
-            self._set_ttl_out_mode('pwm')
+            self._set_ttl('disabled', 'pwm')
         if state == 'external':
-            self._set_ttl_in_mode('toggle_ttl_out')
-            self._set_ttl_out_mode('low')
+            self._set_ttl('toggle_ttl_out', 'low')
         self.state = state
         if self.verbose:
             print("%s: -> done setting pwm state."%self.name)
@@ -511,16 +766,15 @@ if __name__ == '__main__':
             stl.append(r(0, ms.max_settle_time_ms[a]))
             pre.append(r(ms.min_precision_um[a], ms.max_precision_um[a]))
             pos.append(r(min_pos[a], max_pos[a]))
-        ms._set_velocity(tuple(vel))
-        ms._set_acceleration(tuple(acc))
-        ms._set_settle_time(tuple(stl))
-        ms._set_precision(tuple(pre))
+        ms.reconfigure(tuple(vel), tuple(acc), tuple(stl), tuple(pre),
+                       verify=True)
         ms.move_um(tuple(pos), relative=False)
 
-    ms._set_velocity(ms.max_velocity_mmps)          # max speed
-    ms._set_acceleration(ms.min_acceleration_ms)    # fast acceration
-    ms._set_settle_time(len(ms.axes)*(0,))          # no settle time
-    ms._set_precision(ms.min_precision_um)          # max precision
+    ms.reconfigure(velocity_mmps=ms.max_velocity_mmps,        # max speed
+                   acceleration_ms=ms.min_acceleration_ms,    # fast acceration
+                   settle_time_ms=len(ms.axes)*(0,),          # no settle time
+                   precision_um=ms.min_precision_um,          # max precision
+                   verify=True)
     for i in range(iterations):
         print('Test_B:',i)
         pos = []